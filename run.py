@@ -1,11 +1,26 @@
 import os
+import sys
 
 from utils.analyzer import Analyzer
+from utils.beatmap_library import BeatmapLibrary
+from utils.replay_parser import ReplayParser
 
 cwd = os.getcwd()
 data_folder = os.path.join(cwd, "data")
 replay_file = os.path.join(data_folder, "whitecat.osr")
 bmap_file = os.path.join(data_folder, "whitecat.osu")
+
+# run.py [replay.osr] [songs folder] -- the beatmap of the replay is looked up in the songs folder
+if len(sys.argv) > 1:
+    replay_file = sys.argv[1]
+    songs_folder = sys.argv[2] if len(sys.argv) > 2 else data_folder
+    library = BeatmapLibrary(songs_folder, os.path.join(songs_folder, "beatmaps.db"))
+    library.refresh()
+    bmap_file = library.get_path(ReplayParser(replay_file, header_only=True).beatmap_md5)
+    library.close()
+    if bmap_file is None:
+        sys.exit("Beatmap of the replay was not found in {}".format(songs_folder))
+
 an = Analyzer(replay_file, bmap_file)
 
 an.run()
@@ -0,0 +1,43 @@
+import time
+import numpy as np
+
+from utils import curves
+from utils.beatmap import Beatmap
+
+# Compares the fixed SLIDER_QUALITY sampler with adaptive flattening on the bezier and catmull sliders of a map
+beatmap_file = "data/map.osu"
+tolerances = [None, 1, 0.5, 0.25, 0.1]
+
+
+def polyline_distances(points, polyline):
+    """
+    Distance from every point to the closest segment of polyline
+    """
+    starts, ends = polyline[:-1], polyline[1:]
+    segments = ends - starts
+    lengths = np.maximum(np.einsum("ij,ij->i", segments, segments), 1e-12)
+    offsets = points[:, None, :] - starts[None, :, :]
+    t = np.clip(np.einsum("ijk,jk->ij", offsets, segments) / lengths, 0, 1)
+    closest = starts[None, :, :] + t[:, :, None] * segments[None, :, :]
+    return np.min(np.hypot(*(points[:, None, :] - closest).transpose(2, 0, 1)), axis=1)
+
+
+sliders = [h for h in Beatmap(beatmap_file).hitobjects if 2 & h.type and h.slider_type in ("B", "C")]
+curve_types = {"B": curves.Bezier, "C": curves.Catmull}
+references = [np.array([(p.x, p.y) for p in curve_types[s.slider_type](s.curve_points).pos]) for s in sliders]
+
+# Error is the distance from the fixed sampler points to the adaptive path. The fixed sampler samples
+# slightly past the end of every segment (t < 1 + step), which puts a floor under the max error.
+print("{} sliders from {}".format(len(sliders), beatmap_file))
+print("{:<12}{:>10}{:>12}{:>12}{:>12}".format("tolerance", "points", "mean error", "max error", "time (ms)"))
+for tolerance in tolerances:
+    start = time.perf_counter()
+    paths = [curve_types[s.slider_type](s.curve_points, tolerance).pos for s in sliders]
+    elapsed = time.perf_counter() - start
+
+    paths = [np.array([(p.x, p.y) for p in path]) for path in paths]
+    errors = np.concatenate([polyline_distances(reference, path)
+                             for reference, path in zip(references, paths) if len(path) > 1])
+    print("{:<12}{:>10}{:>12.4f}{:>12.4f}{:>12.2f}".format("fixed" if tolerance is None else tolerance,
+                                                        sum(len(p) for p in paths), errors.mean(), errors.max(),
+                                                        elapsed * 1000))
@@ -0,0 +1,52 @@
+import timeit
+from io import BytesIO
+
+from utils.leb128 import Uleb128, decode_string, decode_strings
+
+# Typical replay header strings (beatmap md5, player name, replay md5) and a string with a two byte length
+strings = [b"d41d8cd98f00b204e9800998ecf8427e", b"WhiteCat", b"0cc175b9c0f1b6a831c399e269772661", b"x" * 300]
+
+
+def encode_string(string):
+    length = len(string)
+    encoded = bytearray()
+    while length >= 128:
+        encoded.append((length & 127) | 128)
+        length >>= 7
+    encoded.append(length)
+    return b"\x0b" + bytes(encoded) + string
+
+
+buffer = b"".join(encode_string(s) for s in strings)
+count = len(strings)
+
+
+def class_based():
+    stream = BytesIO(buffer)
+    out = []
+    for _ in range(count):
+        stream.read(1)
+        length = Uleb128(0).decode_from_stream(stream, 'read', 1)
+        out.append(stream.read(length))
+    return out
+
+
+def offset_based():
+    out = []
+    offset = 0
+    for _ in range(count):
+        string, offset = decode_string(buffer, offset)
+        out.append(string)
+    return out
+
+
+def bulk():
+    return decode_strings(buffer, 0, count)[0]
+
+
+assert class_based() == offset_based() == bulk() == strings
+
+number = 100000
+for name, func in [("class based", class_based), ("offset based", offset_based), ("bulk", bulk)]:
+    seconds = timeit.timeit(func, number=number)
+    print("{:<14}{:8.3f} us per {} strings".format(name, seconds / number * 1e6, count))
@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+
+from utils.replay_parser import ReplayParser
+
+replay_file = "data/whitecat.osr"
+
+
+class TestReplayStreaming(unittest.TestCase):
+    """
+    Closing the parser or decoding every frame while iter_frames is only partly read
+    """
+
+    def test_stream_then_close(self):
+        with ReplayParser(replay_file) as replay:
+            stream = replay.iter_frames(100)
+            next(stream)
+        self.assertIsNone(replay.buffer)
+        self.assertEqual(list(stream), [])
+
+    def test_stream_then_frames(self):
+        replay = ReplayParser(replay_file)
+        stream = replay.iter_frames(100)
+        first = next(stream)
+        frames = replay.frames
+        self.assertIsNone(replay.buffer)
+        self.assertEqual(first.time.tolist(), [f.time for f in frames[:100]])
+        replay.close()
+
+    def test_stream_after_frames(self):
+        with ReplayParser(replay_file) as replay:
+            times = np.concatenate([chunk.time for chunk in replay.iter_frames(100)])
+            self.assertTrue(np.array_equal(times, replay.frame_data.time))
+            self.assertTrue(np.array_equal(np.concatenate([chunk.time for chunk in replay.iter_frames(100)]),
+                                           replay.frame_data.time))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 from utils.replay_parser import ReplayParser
 from utils.beatmap import Beatmap
+from utils.difficulty import get_circle_radius
 from utils.gui import GUI, Hitcircle, Cursor, Button, Slider, DebugBox, OSU, Hitobject_Slider, TextBox
 import time
 from utils.mathhelper import clamp, get_closest_as_index, is_inside_radius, Vec2, ms_to_time
@@ -18,6 +19,7 @@ class Analyzer:
 
         self._frames_count = len(self.play_parser.frames)
         self._hitobjects_count = len(self.beatmap_parser.hitobjects)
+        self.hitobject_times = [h.time for h in self.beatmap_parser.hitobjects]
 
         self.current_frame_index = 0
         self.current_hitobject_index = 0
@@ -38,12 +40,7 @@ class Analyzer:
         self.anim_speed = 1
         self.running = True
         # set cs
-        cs = self.beatmap_parser.difficulty["CircleSize"]
-        if self.play_parser.mods & 2:  # easy
-            cs = cs / 2
-        elif self.play_parser.mods & 16:  # hardrock
-            cs = min(cs * 1.3, 10)
-        self.circle_radius = 54.4 - 4.48 * cs
+        self.circle_radius = get_circle_radius(self.beatmap_parser.difficulty["CircleSize"], self.play_parser.mods)
 
         # set od
         od = self.beatmap_parser.difficulty["OverallDifficulty"]
@@ -168,12 +165,14 @@ class Analyzer:
         osu = OSU(self.current_frame, (self.play_parser.mods & 16))
         hc = []
         sliders = []
+        drawables = []  # Hitcircle (+ Hitobject_Slider) of every hitobject
         for h in self.beatmap_parser.hitobjects:
             hc.append(Hitcircle(
                 h.x,
                 384 - h.y if osu.is_hardrock else h.y,
                 h.time,
                 self.circle_radius))
+            drawables.append([hc[-1]])
             if h.type & 2:
                 sliders.append(
                     Hitobject_Slider(
@@ -183,7 +182,15 @@ class Analyzer:
                                 384 - i.y if osu.is_hardrock else i.y) for i in h.curve_points],
                         self.circle_radius,
                         h.time,
-                        h.duration))
+                        h.duration,
+                        slider_type=h.slider_type,
+                        pixel_length=h.pixel_length))
+                drawables[-1].append(sliders[-1])
+
+        # Hitcircles and sliders are drawn up to 450ms before their time
+        hitobject_index = self.beatmap_parser.get_hitobject_index(450)
+        gui.set_visible_hitcircles(lambda: [d for i in hitobject_index.active_at(osu.current_frame.time)
+                                            for d in drawables[i]])
         cursor = Cursor((0, 0), show_path=True)
         button_pause = Button(
             30,
@@ -252,8 +259,7 @@ class Analyzer:
             if slider.is_dragging_ball:
                 self.set_current_frame(get_closest_as_index(
                     self.play_parser.frame_times, int(slider.get_value())))
-                self.set_current_hitobject(get_closest_as_index(
-                    [i.time for i in self.beatmap_parser.hitobjects], int(slider.get_value())))
+                self.set_current_hitobject(get_closest_as_index(self.hitobject_times, int(slider.get_value())))
             else:
                 slider.set_value(
                     self.play_parser.frames[self.current_frame_index].time)
@@ -1,5 +1,21 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, TextIOWrapper
+from bisect import bisect_right
+import numpy as np
 from . import mathhelper
-from .hitobject import HitObject
+from .hitobject import HitObject, HitObjectTable, HitObjectIndex
+
+SECTIONS = ("Difficulty", "TimingPoints", "HitObjects")
+SECTION_HEADER = re.compile(rb"(?:^|[\r\n])(\[(\w+)\])")
+
+TIMING_POINT_DEFAULTS = {
+    "raw_bpm": 600,
+    "raw_spm": -100,
+    "bpm": 100,
+    "spm": 1
+}
 
 
 class Beatmap(object):
@@ -7,11 +23,19 @@ class Beatmap(object):
     Beatmap object for beatmap parsing and handling
     """
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, sections=SECTIONS, section_offsets=None, slider_jobs=None):
         """
-        file_name -- Directory for beatmap file (.osu)
+        file_name -- Directory for beatmap file (.osu), or the file content as bytes or a binary stream
+        sections -- Sections to parse, parsing stops when they are done ([HitObjects] needs the other two)
+        section_offsets -- {section: byte offset} from get_section_offsets, to seek straight to the sections (Optional)
+        slider_jobs -- calculate every slider path and ticks right away in this many processes (Optional, see calc_sliders)
         """
         self.file_name = file_name
+        self.sections = set(sections)
+        if "HitObjects" in self.sections:
+            self.sections.update(("Difficulty", "TimingPoints"))
+        self.section_offsets = section_offsets
+        self.parsed_sections = set()
         self.version = -1  # Unknown by default
         self.header = -1
         self.difficulty = {}
@@ -21,27 +45,70 @@ class Beatmap(object):
             "bpm": {},  # Beats pr minute
             "spm": {}  # Speed modifier
         }
+        self.timing_point_arrays = None  # Sorted (times, values) per timing type, built on first lookup
         self.slider_point_distance = 1  # Changes after [Difficulty] is fully parsed
         self.hitobjects = []
+        self._hitobject_table = None
         self.max_combo = 0
         self.parse_beatmap()
 
-        if "ApproachRate" not in self.difficulty.keys():  # Fix old osu version
+        if "ApproachRate" not in self.difficulty.keys() and "OverallDifficulty" in self.difficulty:  # Fix old osu version
             self.difficulty["ApproachRate"] = self.difficulty["OverallDifficulty"]
 
+        if slider_jobs is not None:
+            self.calc_sliders(slider_jobs)
+
         # print("Beatmap parsed!")
 
     def parse_beatmap(self):
         """
         Parses beatmap file line by line by passing each line into parse_line.
         """
-        with open(self.file_name, encoding="utf8") as file_stream:
-            ver_line = ""
-            while len(ver_line) < 2:  # Find the line where beatmap version is spesified (normaly first line)
-                ver_line = file_stream.readline()
-            self.version = int(''.join(list(filter(str.isdigit, ver_line))))  # Set version
-            for line in file_stream:
-                self.parse_line(line.replace("\n", ""))
+        if isinstance(self.file_name, str):
+            stream = open(self.file_name, "rb")
+        elif isinstance(self.file_name, (bytes, bytearray, memoryview)):
+            stream = BytesIO(self.file_name)
+        else:
+            stream = self.file_name
+
+        try:
+            lines = read_lines(stream, 0)
+            try:
+                ver_line = ""
+                while len(ver_line) < 2:  # Find the line where beatmap version is spesified (normaly first line)
+                    ver_line = next(lines)
+                self.version = int(''.join(list(filter(str.isdigit, ver_line))))  # Set version
+
+                if self.section_offsets is None:
+                    self.parse_lines(lines)
+            finally:
+                lines.close()
+
+            if self.section_offsets is not None:
+                offsets = [self.section_offsets[section] for section in self.sections if section in self.section_offsets]
+                for offset in sorted(offsets):
+                    self.parse_lines(read_lines(stream, offset), single_section=True)
+        finally:
+            if stream is not self.file_name:
+                stream.close()
+
+    def parse_lines(self, lines, single_section=False):
+        """
+        Passes lines into parse_line until every requested section is parsed
+
+        single_section -- stop at the next section header
+        """
+        seen_header = False
+        try:
+            for line in lines:
+                line = line.replace("\n", "")
+                if line.startswith("["):
+                    if self.parsed_sections >= self.sections or (single_section and seen_header):
+                        return
+                    seen_header = True
+                self.parse_line(line)
+        finally:
+            lines.close()
 
     def parse_line(self, line):
         """
@@ -54,11 +121,17 @@ class Beatmap(object):
             return
 
         if line.startswith("["):
-            if line == "[Difficulty]":
+            section = line[1:-1]
+            if section not in self.sections:
+                self.header = -1
+                return
+
+            self.parsed_sections.add(section)
+            if section == "Difficulty":
                 self.header = 0
-            elif line == "[TimingPoints]":
+            elif section == "TimingPoints":
                 self.header = 1
-            elif line == "[HitObjects]":
+            elif section == "HitObjects":
                 self.header = 2
                 self.slider_point_distance = (100 * self.difficulty["SliderMultiplier"]) / self.difficulty[
                     "SliderTickRate"]
@@ -88,6 +161,7 @@ class Beatmap(object):
         Formats timing points used for slider velocity changes,
         and store them into self.timing_points dict.
         """
+        self.timing_point_arrays = None
         timing_point_split = timing_point.split(",")
         timing_point_time = int(float(timing_point_split[0]))  # Fixes some special mappers special needs to use floats
         timing_point_focus = timing_point_split[1]
@@ -169,8 +243,33 @@ class Beatmap(object):
             hitobject = HitObject(int(split_object[0]), int(split_object[1]), time, object_type)
 
         self.hitobjects.append(hitobject)
+        self._hitobject_table = None
         self.max_combo += hitobject.get_combo()
 
+    def calc_sliders(self, jobs=None, chunk_size=64):
+        """
+        Calculates the path and ticks of every slider in a process pool instead of on first access.
+
+        Sliders are independent once their timing point is known, the results are put back in order
+        so the output is the same as calculating them one by one.
+
+        jobs -- amount of worker processes, defaults to the cpu count (1 calculates in this process)
+        chunk_size -- amount of sliders sent to a worker at once
+        """
+        sliders = [hitobject for hitobject in self.hitobjects if 2 & hitobject.type]
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or len(sliders) <= chunk_size:
+            for slider in sliders:
+                slider.tick_array
+            return
+
+        chunks = [sliders[i:i + chunk_size] for i in range(0, len(sliders), chunk_size)]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for chunk, results in zip(chunks, executor.map(calc_slider_chunk, chunks)):
+                for slider, (tick_array, end_ticks) in zip(chunk, results):
+                    slider._tick_array = tick_array
+                    slider._end_ticks = end_ticks
+
     def get_timing_point_all(self, time):
         """
         Returns a object of all current timing types
@@ -178,18 +277,29 @@ class Beatmap(object):
         time -- timestamp
         return -- {"raw_bpm": Float, "raw_spm": Float, "bpm": Float, "spm": Float}
         """
-        types = {
-            "raw_bpm": 600,
-            "raw_spm": -100,
-            "bpm": 100,
-            "spm": 1
-        }  # Will return the default value if timing point were not found
+        types = dict(TIMING_POINT_DEFAULTS)  # Will return the default value if timing point were not found
         for t in types.keys():
             r = self.get_timing_point(time, t)
-            if r != None:
+            if r is not None:
                 types[t] = r
-            # else:
-            # print("{} were not found for timestamp {}, using {} instead.".format(t, time, types[t]))
+
+        return types
+
+    def get_timing_point_all_array(self, times):
+        """
+        Vectorized get_timing_point_all for many timestamps at once
+
+        times -- array like of timestamps
+        return -- {"raw_bpm": np.ndarray, "raw_spm": np.ndarray, "bpm": np.ndarray, "spm": np.ndarray}
+        """
+        times = np.asarray(times)
+        arrays = self.get_timing_point_arrays()
+        types = {}
+        for t, default in TIMING_POINT_DEFAULTS.items():
+            keys, values = arrays[t]
+            indices = np.searchsorted(keys, times, side="right") - 1
+            # Index -1 (no timing point yet) hits the default that is appended last
+            types[t] = np.asarray(values + [default])[indices]
 
         return types
 
@@ -201,16 +311,48 @@ class Beatmap(object):
         timing_type -- mpb, bmp or spm
         return -- self.timing_points object
         """
-        r = None
         try:
-            for key in sorted(self.timing_points[timing_type].keys(), key=lambda k: k):
-                if key <= time:
-                    r = self.timing_points[timing_type][key]
-                else:
-                    break
-        except Exception as e:
+            keys, values = self.get_timing_point_arrays()[timing_type]
+        except KeyError as e:
             print(e)
-        return r
+            return None
+
+        index = bisect_right(keys, time) - 1
+        return values[index] if index >= 0 else None
+
+    def get_timing_point_arrays(self):
+        """
+        Returns the timing points as sorted parallel arrays, {timing_type: (times, values)}
+        """
+        if self.timing_point_arrays is None:
+            self.timing_point_arrays = {}
+            for timing_type, points in self.timing_points.items():
+                keys = sorted(points.keys())
+                self.timing_point_arrays[timing_type] = (keys, [points[key] for key in keys])
+
+        return self.timing_point_arrays
+
+    @property
+    def hitobject_table(self):
+        """
+        HitObjectTable of every hitobject, built on first access (This calculates the slider ticks)
+        """
+        if self._hitobject_table is None:
+            self._hitobject_table = HitObjectTable(self.hitobjects)
+        return self._hitobject_table
+
+    def get_hitobject_index(self, preempt=None):
+        """
+        Returns a HitObjectIndex of the hitobjects
+
+        preempt -- ms an object is visible before its time, defaults to the approach rate preempt
+        """
+        if preempt is None:
+            preempt = get_preempt(self.difficulty["ApproachRate"])
+        # Only the times are needed, so sliders are not calculated for this
+        time = np.array([hitobject.time for hitobject in self.hitobjects], dtype=np.float64)
+        end_time = time + [hitobject.duration if 2 & hitobject.type else 0 for hitobject in self.hitobjects]
+        return HitObjectIndex(time, end_time, preempt)
 
     def get_object_count(self):
         """
@@ -222,3 +364,45 @@ class Beatmap(object):
         for hitobject in self.hitobjects:
             count += hitobject.get_points()
         return count
+
+
+def calc_slider_chunk(sliders):
+    """
+    Returns [(tick_array, end_ticks)] for the given sliders (Used by Beatmap.calc_sliders in worker processes)
+    """
+    return [(slider.tick_array, slider.end_ticks) for slider in sliders]
+
+
+def get_preempt(approach_rate):
+    """
+    Returns the ms a hitobject is visible before its time for the given approach rate
+    """
+    if approach_rate < 5:
+        return 1200 + 600 * (5 - approach_rate) / 5
+    return 1200 - 750 * (approach_rate - 5) / 5
+
+
+def read_lines(stream, offset):
+    """
+    Yields the text lines of a binary stream from a byte offset
+    """
+    stream.seek(offset)
+    text_stream = TextIOWrapper(stream, encoding="utf8")
+    try:
+        for line in text_stream:  # Not "yield from", it would close the stream when the generator is closed
+            yield line
+    finally:
+        text_stream.detach()  # Leaves the stream open
+
+
+def get_section_offsets(file_name):
+    """
+    Returns the byte offset of every section header in a beatmap, {section: offset}
+
+    file_name -- Directory for beatmap file (.osu) or the file content as bytes
+    """
+    if isinstance(file_name, str):
+        with open(file_name, "rb") as file_stream:
+            file_name = file_stream.read()
+
+    return {match.group(2).decode("utf8"): match.start(1) for match in SECTION_HEADER.finditer(file_name)}
@@ -0,0 +1,116 @@
+import os
+import pickle
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+from .beatmap import Beatmap
+
+# Bump when Beatmap or HitObject parsing changes, old cache entries are then ignored
+BEATMAP_FORMAT_VERSION = 6
+
+
+class BeatmapCache:
+    """
+    Cache of fully parsed beatmaps keyed by the md5 of the .osu file
+
+    Beatmaps are kept in an in-process LRU and, if a directory is given, pickled to disk.
+    The md5 is the same as ReplayParser.beatmap_md5 so beatmaps can be looked up from replays.
+
+    directory   -- folder for the on-disk cache (Optional, created if missing)
+    max_entries -- max amount of beatmaps kept in memory
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 32):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.beatmaps = OrderedDict()
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, file_name: str, md5: Optional[str] = None):
+        """
+        Returns the parsed beatmap for file_name, parsing it only if it is not cached
+
+        md5 -- md5 of the file if already known (Optional)
+        """
+        if md5 is None:
+            md5 = file_md5(file_name)
+
+        beatmap = self.get_by_md5(md5)
+        if beatmap is None:
+            beatmap = Beatmap(file_name)
+            beatmap.hitobject_table  # Do the slider work once so it is cached as well
+            self.put(md5, beatmap)
+
+        beatmap.file_name = file_name
+        return beatmap
+
+    def get_by_md5(self, md5):
+        """
+        Returns the cached beatmap for md5 or None if it is not cached
+        """
+        if isinstance(md5, bytes):
+            md5 = md5.decode("ascii", "replace")
+
+        if md5 in self.beatmaps:
+            self.beatmaps.move_to_end(md5)
+            return self.beatmaps[md5]
+
+        path = self.get_path(md5)
+        if path is None or not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path, "rb") as file_stream:
+                beatmap = pickle.load(file_stream)
+            check_beatmap(beatmap)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):  # Broken entry, parse again
+            return None
+
+        self.remember(md5, beatmap)
+        return beatmap
+
+    def put(self, md5, beatmap: Beatmap):
+        if isinstance(md5, bytes):
+            md5 = md5.decode("ascii", "replace")
+
+        self.remember(md5, beatmap)
+
+        path = self.get_path(md5)
+        if path is not None:
+            temp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(temp_path, "wb") as file_stream:
+                pickle.dump(beatmap, file_stream, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+
+    def remember(self, md5, beatmap):
+        self.beatmaps[md5] = beatmap
+        self.beatmaps.move_to_end(md5)
+        while len(self.beatmaps) > self.max_entries:
+            self.beatmaps.popitem(last=False)
+
+    def get_path(self, md5):
+        if self.directory is None or not md5.isalnum():
+            return None
+        return os.path.join(self.directory, "{}.v{}.pickle".format(md5, BEATMAP_FORMAT_VERSION))
+
+
+def check_beatmap(beatmap):
+    """
+    Reads the cached parts of a loaded beatmap, raises AttributeError if it was pickled with other attributes
+    """
+    beatmap.hitobject_table
+    for hitobject in beatmap.hitobjects:
+        if 2 & hitobject.type:
+            hitobject.tick_array
+
+
+def file_md5(file_name):
+    """
+    Returns the hex md5 of a file (Same format as ReplayParser.beatmap_md5)
+    """
+    md5 = hashlib.md5()
+    with open(file_name, "rb") as file_stream:
+        for block in iter(lambda: file_stream.read(1024 * 1024), b""):
+            md5.update(block)
+    return md5.hexdigest()
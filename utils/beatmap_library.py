@@ -0,0 +1,97 @@
+import os
+import sqlite3
+from typing import Optional
+from .beatmap import Beatmap
+from .beatmap_cache import BeatmapCache, file_md5
+
+
+class BeatmapLibrary:
+    """
+    Index of the .osu files in a songs folder by md5, used to find the beatmap of a replay
+
+    Files are only hashed again if their mtime or size changed since the last refresh.
+
+    songs_directory -- osu! songs folder
+    database_file   -- path of the sqlite database (created if missing)
+    cache           -- BeatmapCache used when loading beatmaps (Optional)
+    """
+
+    def __init__(self, songs_directory: str, database_file: str, cache: Optional[BeatmapCache] = None):
+        self.songs_directory = songs_directory
+        self.database_file = database_file
+        self.cache = cache
+        self.connection = sqlite3.connect(database_file)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS beatmaps (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                md5 TEXT NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS beatmaps_md5 ON beatmaps (md5)")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def refresh(self):
+        """
+        Scans the songs folder, hashes new and changed .osu files and drops removed ones
+
+        return -- amount of files that were hashed
+        """
+        indexed = {path: (mtime, size) for path, mtime, size in
+                   self.connection.execute("SELECT path, mtime, size FROM beatmaps")}
+
+        found = {}
+        for root, _, files in os.walk(self.songs_directory):
+            for name in files:
+                if name.lower().endswith(".osu"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:  # Broken link or removed since the walk
+                        continue
+                    found[path] = (stat.st_mtime_ns, stat.st_size)
+
+        removed = [(path,) for path in indexed if path not in found]
+        rows = []
+        for path, state in found.items():
+            if indexed.get(path) != state:
+                try:
+                    rows.append((path, *state, file_md5(path)))
+                except OSError:  # Removed or unreadable since the scan
+                    continue
+
+        with self.connection:
+            self.connection.executemany("DELETE FROM beatmaps WHERE path = ?", removed)
+            self.connection.executemany("INSERT OR REPLACE INTO beatmaps VALUES (?, ?, ?, ?)", rows)
+
+        return len(rows)
+
+    def get_path(self, md5):
+        """
+        Returns the path of the .osu file with the given md5 or None if it is not in the library
+        """
+        if isinstance(md5, bytes):
+            md5 = md5.decode("ascii", "replace")
+
+        row = self.connection.execute("SELECT path FROM beatmaps WHERE md5 = ? LIMIT 1", (md5,)).fetchone()
+        return None if row is None else row[0]
+
+    def get_beatmap(self, md5):
+        """
+        Returns the parsed Beatmap with the given md5 (e.g. ReplayParser.beatmap_md5) or None if it is not found
+        """
+        path = self.get_path(md5)
+        if path is None:
+            return None
+
+        if self.cache is not None:
+            if isinstance(md5, bytes):
+                md5 = md5.decode("ascii", "replace")
+            return self.cache.get(path, md5)
+        return Beatmap(path)
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM beatmaps").fetchone()[0]
@@ -1 +1,3 @@
 SLIDER_QUALITY = 50
+SLIDER_TOLERANCE = None  # Max curve error in osu!pixels, set to flatten slider curves adaptively instead
+CURVE_CACHE_SIZE = 1024  # Max amount of slider curves kept by curves.get_curve
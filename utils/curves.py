@@ -1,4 +1,6 @@
 import math
+from functools import lru_cache
+import numpy as np
 from . import constants
 from . import mathhelper
 
@@ -6,105 +8,192 @@ from . import mathhelper
 class Linear(object):  # Because it made sense at the time...
     def __init__(self, points):
         self.pos = points
+        self.path = np.array([(p.x, p.y) for p in points], dtype=np.float64).reshape(-1, 2)
+
+    def points_at_distances(self, distances):
+        """
+        Returns the points at the given distances along the line through the first two points as a (k, 2) array
+        """
+        p0, p1 = self.pos[0], self.pos[1]
+        direction = np.array([p1.x - p0.x, p1.y - p0.y]) / p0.distance(p1)
+        return np.array([p0.x, p0.y]) + np.asarray(distances, dtype=np.float64)[:, None] * direction
 
 
 class Bezier(object):
-    def __init__(self, points):
+    def __init__(self, points, tolerance=None):
+        """
+        points -- control points
+        tolerance -- max distance (osu!pixels) between the curve and its points, the curve is then
+                     flattened adaptively instead of with the fixed SLIDER_QUALITY sampling (Optional)
+        """
         self.points = points
         self.order = len(self.points)
-        self.pos = []
+        self.tolerance = tolerance
+        self.path = np.empty((0, 2))  # Calculated points as a (n, 2) array
+        self.lengths = None
+        self._pos = None
         self.calc_points()
 
+    @property
+    def pos(self):
+        """
+        Calculated points as Vec2 objects, built from path on first access
+        """
+        if self._pos is None:
+            self._pos = [mathhelper.Vec2(x, y) for x, y in self.path.tolist()]
+        return self._pos
+
     def calc_points(self):
-        if len(
-                self.pos) != 0:  # This should never happen but since im working on this I want to warn myself if I fuck up
+        if len(self.path) != 0:  # This should never happen but since im working on this I want to warn myself if I fuck up
             raise Exception("Bezier was calculated twice!")
 
+        segments = []
         sub_points = []
         for i in range(len(self.points)):
             if i == len(self.points) - 1:
                 sub_points.append(self.points[i])
-                self.bezier(sub_points)
+                segments.append(self.bezier(sub_points))
                 sub_points.clear()
             elif len(sub_points) > 1 and self.points[i] == sub_points[-1]:
-                self.bezier(sub_points)
+                segments.append(self.bezier(sub_points))
                 sub_points.clear()
 
             sub_points.append(self.points[i])
 
+        if segments:
+            self.path = np.concatenate(segments)
+
     def bezier(self, points):
-        order = len(points)
-        step = 0.25 / constants.SLIDER_QUALITY / order  # Normaly 0.0025
-        i = 0
-        n = order - 1
-        while i < 1 + step:
-            x = 0
-            y = 0
-
-            for p in range(n + 1):
-                a = mathhelper.cpn(p, n) * pow((1 - i), (n - p)) * pow(i, p)
-                x += a * points[p].x
-                y += a * points[p].y
-
-            point = mathhelper.Vec2(x, y)
-            self.pos.append(point)
-            i += step
+        """
+        Returns the points of one bezier segment as a (n, 2) array, basis @ control points
+        """
+        control_points = np.array([(p.x, p.y) for p in points], dtype=np.float64)
+        if self.tolerance is not None:
+            return flatten_bezier(control_points, self.tolerance)
+        return get_bernstein_basis(len(points), constants.SLIDER_QUALITY) @ control_points
 
     def point_at_distance(self, length):
-        return {
-            0: False,
-            1: self.points[0],
-        }.get(self.order, self.rec(length))
-
-    def rec(self, length):
-        return mathhelper.point_at_distance(self.pos, length)
+        if self.order == 0:
+            return False
+        x, y = self.points_at_distances([length])[0]
+        return mathhelper.Vec2(x, y)
+
+    def points_at_distances(self, distances):
+        """
+        Returns the points at the given distances along the curve as a (k, 2) array
+        """
+        if self.order == 1:
+            return np.tile([self.points[0].x, self.points[0].y], (len(distances), 1)).astype(np.float64)
+        if self.lengths is None:  # Arc length table, built once
+            self.lengths = mathhelper.cumulative_lengths(self.path)
+        return mathhelper.points_at_distances(self.path, self.lengths, distances)
+
+
+@lru_cache(maxsize=64)
+def get_bernstein_basis(order, quality):
+    """
+    Returns the bernstein basis matrix (samples, order) for a bezier segment with order control points.
+
+    The sample times are the same as stepping t from 0 by 0.25 / quality / order while t < 1 + step.
+    """
+    step = 0.25 / quality / order  # Normaly 0.0025
+    times = []
+    i = 0
+    while i < 1 + step:
+        times.append(i)
+        i += step
+
+    n = order - 1
+    t = np.array(times)[:, None]
+    p = np.arange(order)[None, :]
+    coefficients = np.array([mathhelper.cpn(k, n) for k in range(order)])[None, :]
+    basis = coefficients * np.power(1 - t, n - p) * np.power(t, p)
+    basis.setflags(write=False)
+    return basis
 
 
 class Catmull(object):  # Yes... I cry deep down on the inside aswell
-    def __init__(self, points):
+    def __init__(self, points, tolerance=None):
+        """
+        points -- control points
+        tolerance -- max distance (osu!pixels) between the curve and its points, the curve is then
+                     flattened adaptively instead of with the fixed SLIDER_QUALITY sampling (Optional)
+        """
         self.points = points
         self.order = len(points)
+        self.tolerance = tolerance
         self.step = 2.5 / constants.SLIDER_QUALITY  # Normaly 0.025
-        self.pos = []
+        self.path = np.empty((0, 2))  # Calculated points as a (n, 2) array
+        self.lengths = None
+        self._pos = None
         self.calc_points()
 
+    @property
+    def pos(self):
+        """
+        Calculated points as Vec2 objects, built from path on first access
+        """
+        if self._pos is None:
+            self._pos = [mathhelper.Vec2(x, y) for x, y in self.path.tolist()]
+        return self._pos
+
     def calc_points(self):
-        if len(
-                self.pos) != 0:  # This should never happen but since im working on this I want to warn myself if I fuck up
+        if len(self.path) != 0:  # This should never happen but since im working on this I want to warn myself if I fuck up
             raise Exception("Catmull was calculated twice!")
 
-        for x in range(self.order - 1):
-            t = 0
-            while t < self.step + 1:
-                if x >= 1:
-                    v1 = self.points[x - 1]
-                else:
-                    v1 = self.points[x]
+        if self.order < 2:
+            return
 
-                v2 = self.points[x]
+        # (segments, 4, 2) array of the 4 points used by each segment
+        segments = np.array([[(v.x, v.y) for v in self.get_segment_points(x)] for x in range(self.order - 1)],
+                            dtype=np.float64)
 
-                if x + 1 < self.order:
-                    v3 = self.points[x + 1]
-                else:
-                    v3 = v2.calc(1, v2.calc(-1, v1))
+        if self.tolerance is not None:
+            # A catmull segment is a cubic bezier from v2 to v3
+            self.path = np.concatenate([flatten_bezier(CATMULL_TO_BEZIER @ segment, self.tolerance)
+                                        for segment in segments])
+        else:
+            basis = get_catmull_basis(self.step)
+            self.path = np.einsum("tk,skd->std", basis, segments).reshape(-1, 2)
 
-                if x + 2 < self.order:
-                    v4 = self.points[x + 2]
-                else:
-                    v4 = v3.calc(1, v3.calc(-1, v2))
+    def get_segment_points(self, x):
+        """
+        Returns the 4 points used for the segment between points[x] and points[x + 1]
+        """
+        if x >= 1:
+            v1 = self.points[x - 1]
+        else:
+            v1 = self.points[x]
 
-                point = get_point([v1, v2, v3, v4], t)
-                self.pos.append(point)
-                t += self.step
+        v2 = self.points[x]
 
-    def point_at_distance(self, length):
-        return {
-            0: False,
-            1: self.points[0],
-        }.get(self.order, self.rec(length))
+        if x + 1 < self.order:
+            v3 = self.points[x + 1]
+        else:
+            v3 = v2.calc(1, v2.calc(-1, v1))
+
+        if x + 2 < self.order:
+            v4 = self.points[x + 2]
+        else:
+            v4 = v3.calc(1, v3.calc(-1, v2))
 
-    def rec(self, length):
-        return mathhelper.point_at_distance(self.pos, length)
+        return v1, v2, v3, v4
+
+    def point_at_distance(self, length):
+        if self.order == 0:
+            return False
+        x, y = self.points_at_distances([length])[0]
+        return mathhelper.Vec2(x, y)
+
+    def points_at_distances(self, distances):
+        """
+        Returns the points at the given distances along the curve as a (k, 2) array
+        """
+        if self.order == 1:
+            return np.tile([self.points[0].x, self.points[0].y], (len(distances), 1)).astype(np.float64)
+        if self.lengths is None:  # Arc length table, built once
+            self.lengths = mathhelper.cumulative_lengths(self.path)
+        return mathhelper.points_at_distances(self.path, self.lengths, distances)
 
 
 class Perfect(object):
@@ -121,11 +210,137 @@ class Perfect(object):
         radians = length / self.radius
         return rotate(self.cx, self.cy, self.points[0], radians)
 
-
-def get_point(p, length):
-    x = mathhelper.catmull([o.x for o in p], length)
-    y = mathhelper.catmull([o.y for o in p], length)
-    return mathhelper.Vec2(x, y)
+    def points_at_distances(self, distances):
+        """
+        Returns the points at the given distances along the circle as a (k, 2) array
+        """
+        radians = np.asarray(distances, dtype=np.float64) / self.radius
+        cos, sin = np.cos(radians), np.sin(radians)
+        px, py = self.points[0].x - self.cx, self.points[0].y - self.cy
+        return np.stack((cos * px - sin * py + self.cx, sin * px + cos * py + self.cy), axis=1)
+
+
+def get_curve(slider_type, points, tolerance=None):
+    """
+    Returns the curve of a slider, every unique curve is only calculated once
+
+    Curves are shared between everyone asking for the same one so they must not be modified.
+
+    slider_type -- "L", "P", "B" or "C"
+    points -- control points
+    tolerance -- same as Bezier/Catmull tolerance (Optional)
+    """
+    return _get_curve(slider_type, tuple((p.x, p.y) for p in points), constants.SLIDER_QUALITY, tolerance)
+
+
+@lru_cache(maxsize=constants.CURVE_CACHE_SIZE)
+def _get_curve(slider_type, points, quality, tolerance):
+    # quality is only part of the key, the curves read constants.SLIDER_QUALITY themselves
+    points = [mathhelper.Vec2(x, y) for x, y in points]
+    if slider_type == "L":  # Linear
+        return Linear(points)
+    elif slider_type == "P":  # Perfect
+        return Perfect(points)
+    elif slider_type == "B":  # Bezier
+        return Bezier(points, tolerance)
+    elif slider_type == "C":  # Catmull
+        return Catmull(points, tolerance)
+    raise Exception("Slidertype not supported! ({})".format(slider_type))
+
+
+# Control points of the cubic bezier that is the same curve as a catmull segment
+CATMULL_TO_BEZIER = np.array([[0, 1, 0, 0],
+                              [-1 / 6, 1, 1 / 6, 0],
+                              [0, 1 / 6, 1, -1 / 6],
+                              [0, 0, 1, 0]])
+
+
+@lru_cache(maxsize=8)
+def get_catmull_basis(step):
+    """
+    Returns the (samples, 4) matrix that gives the points of a catmull segment from its 4 points.
+
+    The sample times are the same as stepping t from 0 by step while t < 1 + step,
+    and the weights are the catmull-rom polynomial 0.5 * (2 * p1 + (-p0 + p2) * t
+    + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t ^ 2 + (-p0 + 3 * p1 - 3 * p2 + p3) * t ^ 3) written per point.
+    """
+    times = []
+    t = 0
+    while t < step + 1:
+        times.append(t)
+        t += step
+
+    t = np.array(times)
+    basis = 0.5 * np.stack((-t + 2 * t ** 2 - t ** 3,
+                            2 - 5 * t ** 2 + 3 * t ** 3,
+                            t + 4 * t ** 2 - 3 * t ** 3,
+                            -t ** 2 + t ** 3), axis=1)
+    basis.setflags(write=False)
+    return basis
+
+
+def flatten_bezier(control_points, tolerance):
+    """
+    Flattens a bezier curve into as few points as possible where no part of the curve is further
+    than tolerance from the line between its points.
+
+    The curve is split in half (de Casteljau) until the control points of a piece are within tolerance
+    of the line between its ends, the curve lies inside their hull so the piece is then flat enough.
+    The pieces only have a few points, so they are worked on as plain floats instead of numpy arrays.
+
+    control_points -- (order, 2) array
+    return -- (n, 2) array
+    """
+    control_points = [tuple(point) for point in np.asarray(control_points, dtype=np.float64).tolist()]
+    points = [control_points[0]]
+    stack = [(control_points, 0)]
+    while stack:
+        piece, depth = stack.pop()
+        if depth >= 24 or is_flat(piece, tolerance):
+            points.append(piece[-1])
+            continue
+
+        left, right = subdivide(piece)
+        stack.append((right, depth + 1))
+        stack.append((left, depth + 1))
+
+    return np.array(points)
+
+
+def is_flat(control_points, tolerance):
+    """
+    True if every inner control point is within tolerance of the line segment between the ends
+
+    control_points -- list of (x, y)
+    """
+    start_x, start_y = control_points[0]
+    chord_x, chord_y = control_points[-1][0] - start_x, control_points[-1][1] - start_y
+    chord_length = chord_x * chord_x + chord_y * chord_y
+    max_offset = tolerance * tolerance
+    for x, y in control_points[1:-1]:
+        x -= start_x
+        y -= start_y
+        if chord_length > 0:
+            t = min(max((x * chord_x + y * chord_y) / chord_length, 0), 1)
+            x -= t * chord_x
+            y -= t * chord_y
+        if x * x + y * y > max_offset:
+            return False
+    return True
+
+
+def subdivide(control_points):
+    """
+    Splits a bezier curve (list of (x, y)) at t = 0.5, returns the control points of both halves
+    """
+    left = [control_points[0]]
+    right = [control_points[-1]]
+    points = control_points
+    while len(points) > 1:
+        points = [((x0 + x1) / 2, (y0 + y1) / 2) for (x0, y0), (x1, y1) in zip(points, points[1:])]
+        left.append(points[0])
+        right.append(points[-1])
+    return left, right[::-1]
 
 
 def get_circum_circle(p):
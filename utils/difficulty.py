@@ -0,0 +1,148 @@
+"""
+Star rating calculation based on osu!'s strain model (aim + speed)
+
+This is an approximation of the official calculation: hitobjects are rated from their start positions
+(slider paths are not followed) and the formulas are the simpler pre 2019 ones with an angle bonus for speed.
+"""
+import math
+import numpy as np
+
+STRAIN_STEP = 400  # Length of a strain section (ms)
+DECAY_WEIGHT = 0.9  # Weight of each following strain peak
+MIN_DELTA_TIME = 50  # Objects closer than this are treated as this far apart (ms)
+DIFFICULTY_MULTIPLIER = 0.0675
+
+AIM_DECAY_BASE = 0.15
+AIM_SKILL_MULTIPLIER = 26.25
+SPEED_DECAY_BASE = 0.3
+SPEED_SKILL_MULTIPLIER = 1400
+
+SINGLE_SPACING_THRESHOLD = 125
+STREAM_SPACING_THRESHOLD = 110
+SPEED_ANGLE_BONUS_BEGIN = 5 * math.pi / 6
+
+
+def get_circle_radius(circle_size, mods=0):
+    """
+    Returns the hitcircle radius in osu!pixels for the given CircleSize and mods (EZ/HR)
+    """
+    if mods & 2:  # easy
+        circle_size = circle_size / 2
+    elif mods & 16:  # hardrock
+        circle_size = min(circle_size * 1.3, 10)
+    return 54.4 - 4.48 * circle_size
+
+
+def get_speed_multiplier(mods=0):
+    """
+    Returns the playback speed for the given mods (HT/DT)
+    """
+    if mods & 256:  # halftime
+        return 0.75
+    elif mods & 64:  # doubletime
+        return 1.5
+    return 1
+
+
+def calculate_difficulty(beatmap, mods=0):
+    """
+    Calculates the star rating of a parsed beatmap
+
+    beatmap -- Beatmap
+    mods -- mods bitmask (Same as ReplayParser.mods)
+    return -- {"aim": Float, "speed": Float, "stars": Float}
+    """
+    if len(beatmap.hitobjects) < 2:
+        return {"aim": 0.0, "speed": 0.0, "stars": 0.0}
+
+    objects = np.array([(h.x, h.y, h.time) for h in beatmap.hitobjects], dtype=np.float64)
+    radius = get_circle_radius(beatmap.difficulty["CircleSize"], mods)
+    # Distances are normalized to a radius 52 circle, like in osu!
+    positions = objects[:, :2] * (52 / radius)
+    times = objects[:, 2] / get_speed_multiplier(mods)
+
+    movements = np.diff(positions, axis=0)
+    distances = np.hypot(movements[:, 0], movements[:, 1])
+    delta_times = np.maximum(np.diff(times), MIN_DELTA_TIME)
+    angles = get_angles(movements)
+
+    aim_values = np.power(distances, 0.99) / delta_times
+    speed_values = get_speed_values(distances, angles) / delta_times
+
+    aim = get_skill_difficulty(times[1:], aim_values * AIM_SKILL_MULTIPLIER, AIM_DECAY_BASE)
+    speed = get_skill_difficulty(times[1:], speed_values * SPEED_SKILL_MULTIPLIER, SPEED_DECAY_BASE)
+
+    aim_rating = math.sqrt(aim) * DIFFICULTY_MULTIPLIER
+    speed_rating = math.sqrt(speed) * DIFFICULTY_MULTIPLIER
+    return {
+        "aim": aim_rating,
+        "speed": speed_rating,
+        "stars": aim_rating + speed_rating + abs(aim_rating - speed_rating) / 2
+    }
+
+
+def get_angles(movements):
+    """
+    Returns the angle at every object between the movement into it and out of it (NaN if unknown)
+    """
+    angles = np.full(len(movements), np.nan)
+    previous, current = -movements[:-1], movements[1:]
+    dot = np.einsum("ij,ij->i", previous, current)
+    cross = previous[:, 0] * current[:, 1] - previous[:, 1] * current[:, 0]
+    angles[1:] = np.abs(np.arctan2(cross, dot))
+    return angles
+
+
+def get_speed_values(distances, angles):
+    """
+    Speed value of every movement from its (capped) distance, with a bonus for sharp angles
+    """
+    distances = np.minimum(distances, SINGLE_SPACING_THRESHOLD)
+    values = np.select(
+        [distances > STREAM_SPACING_THRESHOLD, distances > 90, distances > 45],
+        [1.6 + 0.9 * (distances - STREAM_SPACING_THRESHOLD) / 15,
+         1.2 + 0.4 * (distances - 90) / 20,
+         0.95 + 0.25 * (distances - 45) / 45],
+        0.95)
+
+    angles = np.where(np.isnan(angles), math.pi, angles)
+    bonus = np.where(angles < SPEED_ANGLE_BONUS_BEGIN, 1 + np.sin(SPEED_ANGLE_BONUS_BEGIN - angles) ** 2 / 3.57, 1)
+    bonus = np.where(angles < math.pi / 2, 1.28, bonus)
+    return values * bonus
+
+
+def get_strains(times, values, decay_base):
+    """
+    Strain after every object: strain[i] = strain[i - 1] * decay_base ^ (delta_time / 1000) + values[i]
+
+    Solved as decayed cumulative sums in blocks, so the exponents can not overflow.
+    """
+    strains = np.empty(len(values))
+    log_decay = math.log(decay_base) / 1000
+    block_length = 30000  # ms, keeps decay_base ^ -(block_length / 1000) in float range
+
+    carry = 0.0
+    carry_time = times[0]
+    start = 0
+    while start < len(values):
+        end = int(np.searchsorted(times, times[start] + block_length, side="right"))
+        block_times = times[start:end] - times[start]
+        growth = np.exp(-log_decay * block_times)
+        strains[start:end] = (np.cumsum(values[start:end] * growth) / growth +
+                              carry * np.exp(log_decay * (times[start:end] - carry_time)))
+        carry = strains[end - 1]
+        carry_time = times[end - 1]
+        start = end
+
+    return strains
+
+
+def get_skill_difficulty(times, values, decay_base):
+    """
+    Weighted sum of the highest strain of every STRAIN_STEP section
+    """
+    strains = get_strains(times, values, decay_base)
+    sections = ((times - times[0]) // STRAIN_STEP).astype(np.int64)
+    starts = np.flatnonzero(np.diff(sections, prepend=-1))
+    peaks = np.sort(np.maximum.reduceat(strains, starts))[::-1]
+    return float(np.sum(peaks * DECAY_WEIGHT ** np.arange(len(peaks))))
@@ -1,23 +1,75 @@
+import numpy as np
+
+
 class Frame:
+    __slots__ = ("time", "time_since_previous", "x", "y", "keys")
+
     def __init__(self, time, time_since_previous, x, y, keys):
+        """
+        keys -- key bitmask (M1 = 1, M2 = 2, K1 = 4, K2 = 8, Smoke = 16)
+        """
         self.time = time
         self.time_since_previous = time_since_previous
         self.x = x
         self.y = y
+        self.keys = keys
+
+    @property
+    def m1_pressed(self):
+        return bool(self.keys & 1)
+
+    @property
+    def m2_pressed(self):
+        return bool(self.keys & 2)
+
+    @property
+    def k1_pressed(self):
+        return bool(self.keys & 4)
+
+    @property
+    def k2_pressed(self):
+        return bool(self.keys & 8)
+
+    @property
+    def smoke_pressed(self):
+        return bool(self.keys & 16)
+
+
+class FrameArray:
+    """
+    Columnar storage for replay frames
+
+    Every field is kept in its own contiguous numpy array so analysis code can
+    work on the whole replay at once instead of looping over Frame objects.
+
+    time                -- absolute timestamp (ms)
+    time_since_previous -- delta to the previous frame (ms)
+    x                   -- cursor x position
+    y                   -- cursor y position
+    keys                -- key bitmask (M1 = 1, M2 = 2, K1 = 4, K2 = 8, Smoke = 16)
+    """
+
+    def __init__(self, time, time_since_previous, x, y, keys):
+        self.time = np.ascontiguousarray(time, dtype=np.int64)
+        self.time_since_previous = np.ascontiguousarray(time_since_previous, dtype=np.int32)
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.keys = np.ascontiguousarray(keys, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, index):
+        return Frame(int(self.time[index]), int(self.time_since_previous[index]), float(self.x[index]),
+                     float(self.y[index]), int(self.keys[index]))
+
+    def to_frames(self):
+        """
+        Builds a list of Frame objects (Slow, only used for compatibility)
+        """
+        return [Frame(*f) for f in zip(self.time.tolist(), self.time_since_previous.tolist(), self.x.tolist(),
+                                       self.y.tolist(), self.keys.tolist())]
+
 
-        self.m1_pressed = False
-        self.m2_pressed = False
-        self.k1_pressed = False
-        self.k2_pressed = False
-        self.smoke_pressed = False
-        for i in keys:
-            if i == 1:
-                self.m1_pressed = True
-            if i == 2:
-                self.m2_pressed = True
-            if i == 4:
-                self.k1_pressed = True
-            if i == 8:
-                self.k2_pressed = True
-            if i == 16:
-                self.smoke_pressed = True
+def get_keys_from_bits(num: int):
+    return [i for i in [1, 2, 4, 8, 16] if i & num]
@@ -0,0 +1,98 @@
+import os
+import zipfile
+import numpy as np
+from utils.frame import FrameArray
+
+# Bump when the way frames are parsed changes, old cache entries are then ignored
+FRAME_FORMAT_VERSION = 1
+FRAME_COLUMNS = ("time", "time_since_previous", "x", "y", "keys")
+
+
+class FrameCache:
+    """
+    On-disk cache of parsed replay frames keyed by replay md5
+
+    Every replay is stored as uncompressed numpy arrays (.npz) next to each other in one folder.
+    When the folder grows above max_size the least recently used entries are removed.
+
+    directory   -- folder to store the cache in (created if missing)
+    max_size    -- max total size of the cache in bytes
+    """
+
+    def __init__(self, directory: str, max_size: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, replay_md5):
+        if isinstance(replay_md5, bytes):
+            replay_md5 = replay_md5.decode("ascii", "replace")
+        if not replay_md5 or not replay_md5.isalnum():
+            return None
+        return os.path.join(self.directory, "{}.v{}.npz".format(replay_md5, FRAME_FORMAT_VERSION))
+
+    def get(self, replay_md5):
+        """
+        Returns the cached FrameArray for replay_md5 or None if it is not cached
+        """
+        path = self.get_path(replay_md5)
+        if path is None or not os.path.isfile(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                frame_data = FrameArray(*[data[column] for column in FRAME_COLUMNS])
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):  # Broken entry, parse again
+            self.remove(path)
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:  # Read only cache, the entry is still fine to use
+            pass
+        return frame_data
+
+    def put(self, replay_md5, frame_data: FrameArray):
+        """
+        Stores frame_data for replay_md5 and evicts old entries if the cache is too big
+        """
+        path = self.get_path(replay_md5)
+        if path is None:
+            return
+
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp_path, "wb") as file_stream:
+            np.savez(file_stream, **{column: getattr(frame_data, column) for column in FRAME_COLUMNS})
+        os.replace(temp_path, path)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_size
+        """
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self.remove(path)
+            total_size -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".npz"):
+                self.remove(entry.path)
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,8 +1,10 @@
 import sys
+import numpy as np
 import pygame
 from pygame import gfxdraw
-from utils.mathhelper import clamp, is_inside_radius
-from utils.curves import Bezier
+from utils import constants
+from utils.mathhelper import clamp, is_inside_radius, Vec2, cumulative_lengths
+from utils.curves import get_curve
 
 
 class GUI:
@@ -20,6 +22,7 @@ class GUI:
 
         GUI.clock = pygame.time.Clock()
         GUI.hitcircles = []
+        GUI.visible_hitcircles = None
         GUI.elements = []
         GUI.cursor = Cursor((0, 0))
 
@@ -80,6 +83,12 @@ class GUI:
     def add_holding_down_event(self, keys, event):
         GUI.holding_down_events.append((keys, event))
 
+    def set_visible_hitcircles(self, query):
+        """
+        query -- function returning the hitcircles that can be visible right now, so the rest are not checked
+        """
+        GUI.visible_hitcircles = query
+
     def draw(self):
         self.mouse_events()
         self.keyboard_events()
@@ -92,7 +101,8 @@ class GUI:
         self.screen.fill((20, 20, 20))
         self.play_area.fill((0, 0, 0))
 
-        for i in GUI.hitcircles:
+        hitcircles = GUI.hitcircles if GUI.visible_hitcircles is None else GUI.visible_hitcircles()
+        for i in hitcircles:
             i.display()
 
         GUI.cursor.display()
@@ -186,10 +196,15 @@ class Hitcircle(OSU):
 
 class Hitobject_Slider(OSU):
     def __init__(self, control_points, circle_radius, time, duration,
-                 show_control_points=False, color=(255, 0, 0)):
-        self.control_points = control_points
-        self.bezier = Bezier(control_points)
+                 show_control_points=False, color=(255, 0, 0), slider_type="B", pixel_length=None):
+        """
+        slider_type -- curve type of the slider ("L", "P", "B" or "C")
+        pixel_length -- length of the slider (Optional for bezier and catmull sliders, the whole curve is drawn then)
+        """
+        self.slider_type = slider_type
+        self.pixel_length = pixel_length
         self.circle_radius = circle_radius
+        self.set_control_points(control_points)
         self.color = color
         self.time = time
         self.duration = duration
@@ -198,7 +213,23 @@ class Hitobject_Slider(OSU):
         self.n = 0
 
     def set_control_points(self, control_points):
-        self.bezier = Bezier(control_points)
+        self.control_points = control_points
+        curve = get_curve(self.slider_type, control_points, constants.SLIDER_TOLERANCE)
+        pixel_length = self.pixel_length
+        if pixel_length is None:
+            pixel_length = cumulative_lengths(curve.path)[-1] if len(curve.path) > 1 else 0
+
+        # The body is sampled at most 5 osu!pixels apart from start to end, always with at least 2 points
+        distances = np.linspace(0, pixel_length, max(2, int(np.ceil(pixel_length / 5)) + 1))
+        path = curve.points_at_distances(distances)
+        self.pos = [Vec2(x, y) for x, y in path.tolist()]
+
+        # Edges of the body are the path moved by the circle radius along its normals
+        directions = np.gradient(path, axis=0)
+        direction_lengths = np.hypot(directions[:, 0], directions[:, 1])
+        moving = direction_lengths > 0
+        normals = directions[moving][:, ::-1] * [-1, 1] / direction_lengths[moving, None] * self.circle_radius
+        self.edges = (path[moving] + normals, path[moving] - normals)
 
     def display(self):
         if not (0 - self.duration < (self.time - OSU.current_frame.time) < 450):
@@ -209,9 +240,10 @@ class Hitobject_Slider(OSU):
         self.offset_width = (play_area_width - 512) // 2
         # offset between play area and GUI surface
         self.offset_height = (play_area_height - 384) // 2
+        offset = (self.offset_width, self.offset_height)
 
-        for i in [self.bezier.pos[0], self.bezier.pos[len(
-                self.bezier.pos) // 2], self.bezier.pos[-1]]:
+        for i in [self.pos[0], self.pos[len(
+                self.pos) // 2], self.pos[-1]]:
             a = i
             gfxdraw.aacircle(
                 GUI.play_area,
@@ -219,43 +251,14 @@ class Hitobject_Slider(OSU):
                 int(a.y) + self.offset_height,
                 int(self.circle_radius),
                 (0, 0, 255))
-        l1 = []
-        l2 = []
-        for i in range(1, len(self.bezier.pos), 10):
-            diffx = self.bezier.pos[i].x - self.bezier.pos[i - 1].x
-            diffy = self.bezier.pos[i].y - self.bezier.pos[i - 1].y
-            slope = diffy / diffx
-            b = pow(pow(self.circle_radius, 2) / (pow(slope, 2) + 1), 0.5)
-            a = -slope * b
-            l1.append(
-                (self.bezier.pos[i].x +
-                 a +
-                 self.offset_width,
-                 self.bezier.pos[i].y +
-                 b + self.offset_height))
-            l2.append(
-                (self.bezier.pos[i].x -
-                 a +
-                 self.offset_width,
-                 self.bezier.pos[i].y -
-                 b + self.offset_height))
-
-        pygame.draw.aalines(
-            GUI.play_area,
-            pygame.Color("cyan"),
-            False,
-            l1,
-            3)
 
         pygame.draw.aalines(GUI.play_area, pygame.Color("gray"), False, [
-            (i.x + self.offset_width, i.y + self.offset_height) for i in self.bezier.pos], 3)
+            (i.x + self.offset_width, i.y + self.offset_height) for i in self.pos], 3)
+
+        if len(self.edges[0]) > 1:  # A slider that does not move has no body
+            for edge in self.edges:
+                pygame.draw.aalines(GUI.play_area, pygame.Color("cyan"), False, (edge + offset).tolist(), 3)
 
-        pygame.draw.aalines(
-            GUI.play_area,
-            pygame.Color("cyan"),
-            False,
-            l2,
-            3)
         if self.show_control_points:
             for i in self.control_points:
                 pygame.draw.circle(GUI.play_area, (255, 0, 0),
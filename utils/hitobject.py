@@ -1,6 +1,6 @@
 import math
-import copy
-from . import mathhelper, curves
+import numpy as np
+from . import constants, mathhelper, curves
 
 
 class SliderTick(object):
@@ -49,29 +49,74 @@ class HitObject(object):
             self.duration = (int(self.timing_point["raw_bpm"]) * (pixel_length / (
                         self.difficulty["SliderMultiplier"] * self.timing_point["spm"])) / 100) * self.repeat
 
-            self.ticks = []
-            self.end_ticks = []
+            # Slider geometry and ticks are calculated on first access
+            self._curve = None
+            self._tick_array = None
+            self._ticks = None
+            self._end_ticks = None
 
+            self.fix_slider_type()
+
+    @property
+    def tick_array(self):
+        """
+        Slider ticks of every span as a (n, 3) array of x, y, time
+        """
+        if self._tick_array is None:
             self.calc_slider()
+        return self._tick_array
 
-    def calc_slider(self, calc_path=False):
+    @property
+    def ticks(self):
+        """
+        Slider ticks as SliderTick objects, built from tick_array on first access (Use tick_array for new code)
+        """
+        if self._ticks is None:
+            self._ticks = [SliderTick(x, y, time) for x, y, time in self.tick_array.tolist()]
+        return self._ticks
+
+    @property
+    def end_ticks(self):
+        if self._end_ticks is None:
+            self.calc_slider()
+        return self._end_ticks
+
+    @property
+    def curve(self):
+        """
+        Curve of the slider, None for linear sliders
+        """
+        if self._curve is None and self.slider_type in ("P", "B", "C"):
+            self._curve = curves.get_curve(self.slider_type, self.curve_points, constants.SLIDER_TOLERANCE)
+        return self._curve
+
+    def fix_slider_type(self):
         # Fix broken objects
         if self.slider_type == "P" and len(self.curve_points) > 3:
             self.slider_type = "B"
         elif len(self.curve_points) == 2:
             self.slider_type = "L"
 
-        # Make curve
-        if self.slider_type == "P":  # Perfect
+        if self.slider_type == "P":  # Perfect sliders on a straight line can not be made into a circle
             try:
-                curve = curves.Perfect(self.curve_points)
+                curves.get_circum_circle(self.curve_points)
             except:
-                curve = curves.Bezier(self.curve_points)
                 self.slider_type = "B"
-        elif self.slider_type == "B":  # Bezier
-            curve = curves.Bezier(self.curve_points)
-        elif self.slider_type == "C":  # Catmull
-            curve = curves.Catmull(self.curve_points)
+
+    def get_tick_count(self):
+        """
+        Amount of ticks on a single span of the slider (Does not need the slider path)
+        """
+        count = 0
+        current_distance = self.tick_distance
+        while current_distance < self.pixel_length - self.tick_distance / 8:
+            count += 1
+            current_distance += self.tick_distance
+        return count
+
+    def calc_slider(self, calc_path=False):
+        curve = self.curve
+        end_ticks = []
 
         # Quickest to skip this
         if calc_path:  # Make path if requested (For drawing visual for testing)
@@ -91,60 +136,70 @@ class HitObject(object):
             else:
                 raise Exception("Slidertype not supported! ({})".format(self.slider_type))
 
-        # Set slider ticks
+        # Set slider ticks on the first span
         current_distance = self.tick_distance
         time_add = self.duration * (self.tick_distance / (self.pixel_length * self.repeat))
 
+        distances = []
         while current_distance < self.pixel_length - self.tick_distance / 8:
-            if self.slider_type == "L":  # Linear
-                point = mathhelper.point_on_line(self.curve_points[0], self.curve_points[1], current_distance)
-            else:  # Perfect, Bezier & Catmull uses the same function
-                point = curve.point_at_distance(current_distance)
-
-            self.ticks.append(SliderTick(point.x, point.y, self.time + time_add * (len(self.ticks) + 1)))
+            distances.append(current_distance)
             current_distance += self.tick_distance
 
-        # Adds slider_ends / repeat_points
-        repeat_id = 1
-        repeat_bonus_ticks = []
-        while repeat_id < self.repeat:
-            dist = (1 & repeat_id) * self.pixel_length
-            time_offset = (self.duration / self.repeat) * repeat_id
-
-            if self.slider_type == "L":  # Linear
-                point = mathhelper.point_on_line(self.curve_points[0], self.curve_points[1], dist)
-            else:  # Perfect, Bezier & Catmull uses the same function
-                point = curve.point_at_distance(dist)
+        # All ticks of the first span are looked up at once
+        base_ticks = np.empty((len(distances), 3))
+        base_ticks[:, :2] = self.points_at_distances(distances)
+        base_ticks[:, 2] = self.time + time_add * np.arange(1, len(distances) + 1)
 
-            self.end_ticks.append(SliderTick(point.x, point.y, self.time + time_offset))
+        # Every repeat has the same ticks, reversed on odd repeats, moved by the span duration
+        span_duration = self.duration / self.repeat
+        repeat_ids = np.arange(1, self.repeat)
+        odd = (repeat_ids & 1).astype(bool)[:, None]
+        time_offsets = (span_duration * repeat_ids)[:, None]
+        normalize_time_values = np.where(odd, self.time + span_duration, self.time)
 
-            # Adds the ticks that already exists on the slider back (but reversed)
-            repeat_ticks = copy.deepcopy(self.ticks)
+        repeat_positions = np.where(odd[:, :, None], base_ticks[None, ::-1, :2], base_ticks[None, :, :2])
+        repeat_times = self.time + time_offsets + np.abs(
+            np.where(odd, base_ticks[None, ::-1, 2], base_ticks[None, :, 2]) - normalize_time_values)
 
-            if 1 & repeat_id:  # We have to reverse the timing normalizer
-                repeat_ticks = list(reversed(repeat_ticks))
-                normalize_time_value = self.time + (self.duration / self.repeat)
-            else:
-                normalize_time_value = self.time
+        repeat_ticks = np.concatenate((repeat_positions, repeat_times[:, :, None]), axis=2).reshape(-1, 3)
+        self._tick_array = np.concatenate((base_ticks, repeat_ticks))
 
-            # Correct timing
-            for tick in repeat_ticks:
-                tick.time = self.time + time_offset + abs(tick.time - normalize_time_value)
+        # Adds slider_ends / repeat_points, they are either at the end or the start of the slider
+        end_point, start_point = self.points_at_distances([self.pixel_length, 0]).tolist()
+        for repeat_id in range(1, self.repeat):
+            x, y = end_point if 1 & repeat_id else start_point
+            end_ticks.append(SliderTick(x, y, self.time + span_duration * repeat_id))
 
-            repeat_bonus_ticks += repeat_ticks
+        # Add endpoint for slider
+        x, y = end_point if 1 & self.repeat else start_point
+        end_ticks.append(SliderTick(x, y, self.time + self.duration))
 
-            repeat_id += 1
+        self._end_ticks = end_ticks
 
-        self.ticks += repeat_bonus_ticks
+    def point_at_distance(self, distance):
+        if self.slider_type == "L":  # Linear
+            return mathhelper.point_on_line(self.curve_points[0], self.curve_points[1], distance)
+        else:  # Perfect, Bezier & Catmull uses the same function
+            return self.curve.point_at_distance(distance)
 
-        # Add endpoint for slider
-        dist_end = (1 & self.repeat) * self.pixel_length
+    def points_at_distances(self, distances):
+        """
+        Returns the points at the given distances along the slider as a (k, 2) array
+        """
         if self.slider_type == "L":  # Linear
-            point = mathhelper.point_on_line(self.curve_points[0], self.curve_points[1], dist_end)
+            return curves.Linear(self.curve_points).points_at_distances(distances)
         else:  # Perfect, Bezier & Catmull uses the same function
-            point = curve.point_at_distance(dist_end)
+            return self.curve.points_at_distances(distances)
 
-        self.end_ticks.append(SliderTick(point.x, point.y, self.time + self.duration))
+    def __getstate__(self):
+        """
+        The curve and the SliderTick list are left out when pickled, they are rebuilt on access if needed
+        """
+        state = self.__dict__.copy()
+        for key in ("_curve", "_ticks"):
+            if key in state:
+                state[key] = None
+        return state
 
     def get_combo(self):
         """
@@ -153,9 +208,152 @@ class HitObject(object):
         """
         if 2 & self.type:  # Slider
             val = 1  # Start of the slider
-            val += len(self.ticks)  # The amount of sliderticks
+            val += self.get_tick_count() * self.repeat  # The amount of sliderticks
             val += self.repeat  # Reverse slider
         else:  # Normal
             val = 1  # Itself...
 
         return val
+
+
+class HitObjectTable(object):
+    """
+    Columnar view of a list of hitobjects, one numpy array per field
+
+    x, y            -- start position
+    time, end_time  -- start and end timestamp (the same for hitcircles)
+    type            -- type of object (bitmask)
+    repeat          -- amount of repeats (1 for hitcircles)
+    tick_offsets    -- ticks of object i are tick_x/y/time[tick_offsets[i]:tick_offsets[i + 1]]
+    tick_x, tick_y, tick_time -- all slider ticks of the map in one flat array
+    """
+
+    def __init__(self, hitobjects):
+        count = len(hitobjects)
+        self.x = np.empty(count, dtype=np.float64)
+        self.y = np.empty(count, dtype=np.float64)
+        self.time = np.empty(count, dtype=np.float64)
+        self.end_time = np.empty(count, dtype=np.float64)
+        self.type = np.empty(count, dtype=np.int32)
+        self.repeat = np.ones(count, dtype=np.int32)
+        self.tick_offsets = np.zeros(count + 1, dtype=np.int64)
+
+        ticks = [np.empty((0, 3))]
+        tick_count = 0
+        for i, hitobject in enumerate(hitobjects):
+            self.x[i] = hitobject.x
+            self.y[i] = hitobject.y
+            self.time[i] = hitobject.time
+            self.end_time[i] = hitobject.time
+            self.type[i] = hitobject.type
+            if 2 & hitobject.type:
+                self.end_time[i] += hitobject.duration
+                self.repeat[i] = hitobject.repeat
+                ticks.append(hitobject.tick_array)
+                tick_count += len(hitobject.tick_array)
+            self.tick_offsets[i + 1] = tick_count
+
+        ticks = np.concatenate(ticks)
+        self.tick_x = ticks[:, 0].copy()
+        self.tick_y = ticks[:, 1].copy()
+        self.tick_time = ticks[:, 2].copy()
+
+    def __len__(self):
+        return len(self.time)
+
+    def get_ticks(self, index):
+        """
+        Returns (x, y, time) arrays of the ticks of one object
+        """
+        start, end = self.tick_offsets[index], self.tick_offsets[index + 1]
+        return self.tick_x[start:end], self.tick_y[start:end], self.tick_time[start:end]
+
+
+class HitObjectIndex(object):
+    """
+    Time index of hitobjects for finding the objects that are visible/active at a timestamp
+
+    Object i is active from time[i] - preempt to end_time[i]. The intervals are kept in a centered interval
+    tree: every node holds the objects active at its center, sorted by start and by end, the objects that
+    end before the center go to the left child and the ones that start after it to the right child.
+    A query visits O(log n) nodes and only reads the objects it returns.
+
+    time     -- start timestamp of every object
+    end_time -- end timestamp of every object (the same as time for hitcircles)
+    preempt  -- how long before its time an object becomes active (ms)
+    """
+
+    def __init__(self, time, end_time, preempt):
+        self.preempt = preempt
+        self.start = np.asarray(time, dtype=np.float64) - preempt
+        self.end = np.asarray(end_time, dtype=np.float64)
+
+        # Nodes of the tree, one entry per node in every list
+        self.center = []
+        self.left = []
+        self.right = []
+        self.by_start = []  # Objects of the node sorted by start
+        self.starts = []
+        self.by_end = []  # Objects of the node sorted by end, descending
+        self.negative_ends = []  # -end, so it is ascending for searchsorted
+        self.root = self.build(np.arange(len(self.start)))
+
+    def build(self, indices):
+        """
+        Adds the node for the objects in indices (and its children) to the tree, returns its id (-1 if empty)
+        """
+        if len(indices) == 0:
+            return -1
+
+        starts, ends = self.start[indices], self.end[indices]
+        # The median start is inside the object starting there, so no node is empty and both children get at most half
+        center = np.partition(starts, len(starts) // 2)[len(starts) // 2]
+        here = indices[(starts <= center) & (ends >= center)]
+
+        node = len(self.center)
+        self.center.append(center)
+        order = np.argsort(self.start[here], kind="stable")
+        self.by_start.append(here[order])
+        self.starts.append(self.start[here][order])
+        order = np.argsort(-self.end[here], kind="stable")
+        self.by_end.append(here[order])
+        self.negative_ends.append(-self.end[here][order])
+        self.left.append(-1)
+        self.right.append(-1)
+
+        self.left[node] = self.build(indices[ends < center])
+        self.right[node] = self.build(indices[starts > center])
+        return node
+
+    def in_window(self, start, end):
+        """
+        Returns the indices (into the hitobject list) of every object active somewhere in [start, end], sorted
+        """
+        found = []
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if node < 0:
+                continue
+
+            center = self.center[node]
+            if end < center:  # Objects of the node end after the window, the ones starting before its end are in it
+                found.append(self.by_start[node][:np.searchsorted(self.starts[node], end, side="right")])
+                nodes.append(self.left[node])
+            elif start > center:  # Objects of the node start before the window, the ones ending after its start are in it
+                found.append(self.by_end[node][:np.searchsorted(self.negative_ends[node], -start, side="right")])
+                nodes.append(self.right[node])
+            else:  # The window contains the center, so every object of the node is in it
+                found.append(self.by_start[node])
+                nodes.append(self.left[node])
+                nodes.append(self.right[node])
+
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(found))
+
+    def active_at(self, time):
+        """
+        Returns the indices (into the hitobject list) of every object active at time, sorted
+        """
+        return self.in_window(time, time)
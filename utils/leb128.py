@@ -170,6 +170,56 @@ class Sleb128(BaseLEB128):
         super().__init__(base_byte_number)
 
 
+def decode_uleb128(buffer, offset=0):
+    """
+    Fast unsigned LEB128 decoding straight from a buffer
+    buffer: bytes, bytearray, memoryview or mmap
+    offset: position of the first byte of the number
+    return: (value, offset after the number)
+    """
+    byte = buffer[offset]
+    offset += 1
+    if byte < 128:  # Most numbers fits in a single byte
+        return byte, offset
+
+    value = byte & 127
+    shift = 7
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 127) << shift
+        if byte < 128:
+            return value, offset
+        shift += 7
+
+
+def decode_string(buffer, offset=0):
+    """
+    Decodes a osu! string (0x00 if not present, else 0x0b + uleb128 length + bytes)
+    buffer: bytes, bytearray, memoryview or mmap
+    offset: position of the string header
+    return: (bytes or None if not present, offset after the string)
+    """
+    if buffer[offset] != 0x0b:
+        return None, offset + 1
+
+    length, offset = decode_uleb128(buffer, offset + 1)
+    return bytes(buffer[offset:offset + length]), offset + length
+
+
+def decode_strings(buffer, offset, count):
+    """
+    Decodes count consecutive osu! strings
+    return: (list of bytes or None, offset after the last string)
+    """
+    strings = []
+    for _ in range(count):
+        string, offset = decode_string(buffer, offset)
+        strings.append(string)
+
+    return strings, offset
+
+
 class TestUleb128EncodeDecode(unittest.TestCase):
     """
     Try etalon from - https://en.wikipedia.org/wiki/LEB128
@@ -195,6 +245,21 @@ class TestUleb128EncodeDecode(unittest.TestCase):
         """
         self.assertEqual(self.number, self.uleb128.decode(self.bytes))
 
+    def test_decode_buffer(self):
+        """
+        decode from buffer with offset
+        """
+        self.assertEqual((self.number, 4), decode_uleb128(b'\x00' + self.bytes, 1))
+        self.assertEqual((127, 1), decode_uleb128(b'\x7f'))
+
+    def test_decode_strings(self):
+        """
+        decode consecutive osu! strings
+        """
+        buffer = b'\x0b\x03abc\x00\x0b\x00' + b'\x0b\x80\x01' + b'x' * 128
+        self.assertEqual(([b'abc', None, b'', b'x' * 128], len(buffer)), decode_strings(buffer, 0, 4))
+        self.assertEqual((b'abc', 5), decode_string(memoryview(buffer)))
+
 
 class TestSleb128EncodeDecode(unittest.TestCase):
     """
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 
 def get_closest_as_index(arr, target):
@@ -73,14 +74,6 @@ def cpn(p, n):
     return out
 
 
-def catmull(p, t):  # WARNING:   Worst math formula incomming
-    return 0.5 * (
-            (2 * p[1]) +
-            (-p[0] + p[2]) * t +
-            (2 * p[0] - 5 * p[1] + 4 * p[2] - p[3]) * pow(t, 2) +
-            (-p[0] + 3 * p[1] - 3 * p[2] + p[3]) * pow(t, 3))
-
-
 def point_on_line(p0, p1, length):
     full_length = pow(pow(p1.x - p0.x, 2) + pow(p1.y - p0.y, 2), 0.5)
     n = full_length - length
@@ -110,44 +103,47 @@ def cart_from_pol(r, t):
     return Vec2(x, y)
 
 
-def point_at_distance(array, distance):  # TODO: Optimize...
-    i = 0
-    current_distance = 0
-    new_distance = 0
-
+def point_at_distance(array, distance):
+    """
+    Returns the point at distance along a path of Vec2 points
+    """
     if len(array) < 2:
         return Vec2(0, 0)
 
-    if distance == 0:
-        return array[0]
-
-    if distance_from_points(array) <= distance:
-        return array[len(array) - 1]
-
-    for i in range(len(array) - 2):
-        x = (array[i].x - array[i + 1].x)
-        y = (array[i].y - array[i + 1].y)
-
-        new_distance = math.sqrt(x * x + y * y)
-        current_distance += new_distance
+    path = np.array([(p.x, p.y) for p in array], dtype=np.float64)
+    x, y = points_at_distances(path, cumulative_lengths(path), [distance])[0]
+    return Vec2(x, y)
 
-        if distance <= current_distance:
-            break
 
-    current_distance -= new_distance
+def cumulative_lengths(path):
+    """
+    Returns the arc length from the start of a (n, 2) path to each of its points
+    """
+    segments = np.diff(path, axis=0)
+    lengths = np.empty(len(path))
+    lengths[0] = 0
+    np.cumsum(np.hypot(segments[:, 0], segments[:, 1]), out=lengths[1:])
+    return lengths
 
-    if distance == current_distance:
-        return array[i]
-    else:
-        angle = angle_from_points(array[i], array[i + 1])
-        cart = cart_from_pol((distance - current_distance), angle)
 
-        if array[i].x > array[i + 1].x:
-            coord = Vec2((array[i].x - cart.x), (array[i].y - cart.y))
-        else:
-            coord = Vec2((array[i].x + cart.y), (array[i].y + cart.y))
+def points_at_distances(path, lengths, distances):
+    """
+    Returns the points at the given distances along a (n, 2) path as a (k, 2) array
 
-        return coord
+    path -- (n, 2) array of points
+    lengths -- cumulative_lengths(path)
+    distances -- array like of distances, clamped to the path
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    if len(path) < 2:
+        return np.zeros((len(distances), 2))
+
+    distances = np.clip(distances, 0, lengths[-1])
+    indices = np.clip(np.searchsorted(lengths, distances, side="right") - 1, 0, len(path) - 2)
+    segment_lengths = lengths[indices + 1] - lengths[indices]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(segment_lengths > 0, (distances - lengths[indices]) / segment_lengths, 0)
+    return path[indices] + t[:, None] * (path[indices + 1] - path[indices])
 
 
 class Vec2(object):
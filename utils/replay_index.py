@@ -0,0 +1,126 @@
+import os
+import sqlite3
+from typing import Optional
+from utils.replay_parser import parse_many
+
+INDEX_COLUMNS = ("beatmap_md5", "player_name", "mods", "score", "max_combo", "timestamp", "replay_md5")
+
+
+class ReplayIndex:
+    """
+    SQLite index of replay header fields for finding replays without parsing them
+
+    Files are only parsed again if their mtime or size changed since they were indexed.
+
+    database_file -- path of the sqlite database (created if missing)
+    """
+
+    def __init__(self, database_file: str):
+        self.database_file = database_file
+        self.connection = sqlite3.connect(database_file)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS replays (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                beatmap_md5 TEXT,
+                player_name TEXT,
+                mods INTEGER,
+                score INTEGER,
+                max_combo INTEGER,
+                timestamp INTEGER,
+                replay_md5 TEXT
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS replays_beatmap ON replays (beatmap_md5)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS replays_player ON replays (player_name)")
+        # Files that could not be parsed, they are only tried again once they change
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS failed (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def refresh(self, directory: str, jobs: Optional[int] = 1, progress=None):
+        """
+        Indexes every .osr file in directory (recursive).
+
+        New and changed files are parsed (header only), removed files are dropped from the index.
+        Files that fail to parse are remembered and skipped until they change.
+
+        jobs        -- amount of processes used for parsing, see parse_many
+        progress    -- see parse_many
+        return      -- amount of files that were added to the index
+        """
+        indexed = {path: (mtime, size) for path, mtime, size in
+                   self.connection.execute("SELECT path, mtime, size FROM replays UNION ALL "
+                                           "SELECT path, mtime, size FROM failed")}
+
+        found = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.lower().endswith(".osr"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:  # Broken link or removed since the walk
+                        continue
+                    found[path] = (stat.st_mtime_ns, stat.st_size)
+
+        directory_prefix = os.path.join(directory, "")
+        removed = [(path,) for path in indexed if path.startswith(directory_prefix) and path not in found]
+        changed = [path for path, state in found.items() if indexed.get(path) != state]
+
+        rows = []
+        failed = []
+        for result in parse_many(changed, jobs=jobs, header_only=True, progress=progress):
+            if not result.ok:
+                failed.append((result.path, *found[result.path]))
+                continue
+            replay = result.replay
+            rows.append((result.path, *found[result.path], decode_text(replay.beatmap_md5),
+                         decode_text(replay.player_name), replay.mods, replay.score, replay.max_combo,
+                         replay.timestamp, decode_text(replay.replay_md5)))
+
+        with self.connection:
+            for table in ("replays", "failed"):
+                self.connection.executemany("DELETE FROM {} WHERE path = ?".format(table),
+                                            removed + [(path,) for path in changed])
+            self.connection.executemany("INSERT INTO replays VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.connection.executemany("INSERT INTO failed VALUES (?, ?, ?)", failed)
+
+        return len(rows)
+
+    def find(self, beatmap_md5: Optional[str] = None, player_name: Optional[str] = None,
+             mods: Optional[int] = None):
+        """
+        Returns the indexed replays matching every given filter as a list of dicts (path + INDEX_COLUMNS)
+
+        mods -- bitmask of mods that must be enabled (Other mods are allowed)
+        """
+        query = "SELECT path, {} FROM replays WHERE 1".format(", ".join(INDEX_COLUMNS))
+        arguments = []
+        if beatmap_md5 is not None:
+            query += " AND beatmap_md5 = ?"
+            arguments.append(decode_text(beatmap_md5))
+        if player_name is not None:
+            query += " AND player_name = ?"
+            arguments.append(decode_text(player_name))
+        if mods is not None:
+            query += " AND mods & ? = ?"
+            arguments += [mods, mods]
+
+        return [dict(zip(("path",) + INDEX_COLUMNS, row)) for row in self.connection.execute(query, arguments)]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM replays").fetchone()[0]
+
+
+def decode_text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value
@@ -1,67 +1,347 @@
-from typing import Union
+from typing import Optional, Union
+import os
+import mmap
+import struct
+import weakref
+import numpy as np
 from io import BytesIO
-from utils.leb128 import Uleb128
-from lzma import decompress as lzma_decompress
-from utils.frame import Frame
+from utils.leb128 import decode_string, decode_strings
+from lzma import decompress as lzma_decompress, LZMADecompressor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.frame import FrameArray, get_keys_from_bits
+from utils.frame_cache import FrameCache
+
+HEADER_START = struct.Struct("<BI")  # game_mode, version
+HEADER_SCORE = struct.Struct("<6HIHBI")  # counts, score, max_combo, perfect, mods
+HEADER_DATA = struct.Struct("<QI")  # timestamp, compressed_data_length
+HEADER_ONLINE_ID = struct.Struct("<Q")
 
 
 class ReplayParser:
 
-    def __init__(self, replay_file: Union[str, BytesIO]):
+    def __init__(self, replay_file: Union[str, BytesIO, bytes], header_only: bool = False,
+                 cache: Optional[FrameCache] = None):
+        """
+        replay_file -- replay file (.osr), or a BytesIO/bytes of its content
+        header_only -- only parse the header fields, the replay data is skipped and frames are not available
+        cache       -- FrameCache to look up parsed frames in before decompressing (Optional)
+        """
+        self.header_only = header_only
+        self.cache = cache
+        self._mmap = None
+        self.data = None
+        self._streams = weakref.WeakSet()  # iter_frames generators that still read from the buffer
         if isinstance(replay_file, str):
+            # The file is memory mapped, only the pages that are actually read gets loaded
             with open(replay_file, "rb") as replay:
-                self.replay_raw = BytesIO(replay.read())
+                self._mmap = mmap.mmap(replay.fileno(), 0, access=mmap.ACCESS_READ)
+            self.buffer = memoryview(self._mmap)
+        elif isinstance(replay_file, BytesIO):
+            self.buffer = replay_file.getbuffer()
         else:
-            self.replay_raw = replay_file
-
-        self.replay_raw.seek(0)
-        self.game_mode = int.from_bytes(self.replay_raw.read(1), byteorder="little")
-        self.version = int.from_bytes(self.replay_raw.read(4), byteorder="little")
-        self.beatmap_md5 = self.read_string()
-        self.player_name = self.read_string()
-        self.replay_md5 = self.read_string()
-        self.count300 = int.from_bytes(self.replay_raw.read(2), byteorder="little")
-        self.count100 = int.from_bytes(self.replay_raw.read(2), byteorder="little")
-        self.count50 = int.from_bytes(self.replay_raw.read(2), byteorder="little")
-        self.count_geki = int.from_bytes(self.replay_raw.read(2), byteorder="little")
-        self.count_katu = int.from_bytes(self.replay_raw.read(2), byteorder="little")
-        self.count_miss = int.from_bytes(self.replay_raw.read(2), byteorder="little")
-        self.score = int.from_bytes(self.replay_raw.read(4), byteorder="little")
-        self.max_combo = int.from_bytes(self.replay_raw.read(2), byteorder="little")
-        self.perfect = int.from_bytes(self.replay_raw.read(1), byteorder="little")
-        self.mods = int.from_bytes(self.replay_raw.read(4), byteorder="little")
+            self.buffer = memoryview(replay_file)
+
+        self.offset = 0
+        try:
+            self.parse_header()
+        except Exception:
+            self.close()
+            raise
+
+        self._frame_data = None
+        self._frames = None
+        if header_only:  # Nothing else is read from the file
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Releases the replay file (or the buffer of a BytesIO), frames that are not decoded yet can not be read after this
+
+        It is called by itself once the header is parsed in header only mode and once frame_data is decoded.
+        iter_frames generators that are still open are stopped first.
+        """
+        for stream in list(self._streams):
+            stream.close()
+        for view in (self.data, self.buffer):
+            if view is not None:
+                view.release()
+        self.data = None
+        self.buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def parse_header(self):
+        self.game_mode, self.version = self.unpack(HEADER_START)
+        strings, self.offset = decode_strings(self.buffer, self.offset, 3)
+        self.beatmap_md5, self.player_name, self.replay_md5 = ["" if s is None else s for s in strings]
+        (self.count300, self.count100, self.count50, self.count_geki, self.count_katu, self.count_miss,
+         self.score, self.max_combo, self.perfect, self.mods) = self.unpack(HEADER_SCORE)
         self.lifebar = self.read_string()
-        self.timestamp = int.from_bytes(self.replay_raw.read(8), byteorder="little")
-        self.compressed_data_length = int.from_bytes(self.replay_raw.read(4), byteorder="little")
-        self.data = self.replay_raw.read(self.compressed_data_length)
-        self.online_play_id = int.from_bytes(self.replay_raw.read(8), byteorder="little")
-        self.frames, self.frame_times = self.get_frames()
+        self.timestamp, self.compressed_data_length = self.unpack(HEADER_DATA)
+
+        # The compressed data is a slice of the buffer and is handed to the decompressor without copying
+        data_end = self.offset + self.compressed_data_length
+        self.data = None if self.header_only else self.buffer[self.offset:data_end]
+        self.offset = data_end
+
+        if len(self.buffer) - self.offset >= HEADER_ONLINE_ID.size:
+            self.online_play_id, = self.unpack(HEADER_ONLINE_ID)
+        else:  # Old replays does not store the online id
+            self.online_play_id = 0
+
+    def __getstate__(self):
+        """
+        The file buffer can not be pickled, so frames are decoded before the parser is sent between processes
+        """
+        if not self.header_only:
+            self.frame_data
+        state = self.__dict__.copy()
+        for key in ("_mmap", "buffer", "data", "_frames", "_streams"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.buffer = None
+        self.data = None
+        self._frames = None
+        self._streams = weakref.WeakSet()
+
+    def unpack(self, header_struct: struct.Struct):
+        values = header_struct.unpack_from(self.buffer, self.offset)
+        self.offset += header_struct.size
+        return values
+
+    @property
+    def frame_data(self):
+        """
+        FrameArray of every frame, decoded on first access
+        """
+        if self._frame_data is None:
+            self._frame_data = self.get_frames()
+            self.close()  # The file is not needed anymore
+        return self._frame_data
+
+    @property
+    def frames(self):
+        """
+        List of Frame objects, built from frame_data on first access
+        """
+        if self._frames is None:
+            self._frames = self.frame_data.to_frames()
+        return self._frames
+
+    @property
+    def frame_times(self):
+        return self.frame_data.time
 
     def read_string(self):
-        string_header = self.replay_raw.read(1)
-        string = ""
-        if string_header == b'\x0b':
-            string_length = Uleb128(0).decode_from_stream(self.replay_raw, 'read', 1)
-            string = self.replay_raw.read(string_length)
+        string, self.offset = decode_string(self.buffer, self.offset)
+        return "" if string is None else string
 
-        return string
+    def check_frames_available(self):
+        if self.header_only:
+            raise ValueError("Replay was parsed in header only mode, frames are not available")
+        if self.data is None:
+            raise ValueError("Replay was closed before its frames were decoded")
 
     def get_keys_from_bits(self, num: int):
-        return [i for i in [1, 2, 4, 8, 16] if i & num]
+        return get_keys_from_bits(num)
 
     def get_frames(self):
-        readable_data = lzma_decompress(self.data)
-        replay_frames = readable_data.decode("utf-8").split(",")
-        offset = int(replay_frames[1].split("|")[0])
-        replay_frames = [frame.split("|") for frame in replay_frames[2:-2]]
-
-        time = offset
-        absolute_frames = []
-        times = []
-        for frame in replay_frames:
-            time += int(frame[0])
-            absolute_frames.append(
-                Frame(time, int(frame[0]), float(frame[1]), float(frame[2]), self.get_keys_from_bits(int(frame[3]))))
-            times.append(time)
-
-        return absolute_frames, times
+        self.check_frames_available()
+        if self.cache is not None:
+            frame_data = self.cache.get(self.replay_md5)
+            if frame_data is None:
+                frame_data = parse_frames(lzma_decompress(self.data))
+                self.cache.put(self.replay_md5, frame_data)
+            return frame_data
+
+        return parse_frames(lzma_decompress(self.data))
+
+    def iter_frames(self, chunk_size: int = 1024):
+        """
+        Decodes the replay data incrementally and yields FrameArray chunks as they become available.
+
+        Only one chunk of decompressed data is kept in memory at a time, so the first
+        frames can be used before the rest of the replay is decoded.
+        Closing the parser (or decoding frame_data) stops the generator.
+
+        chunk_size -- max amount of frames in each yielded chunk
+        """
+        stream = self._stream_frames(chunk_size)
+        self._streams.add(stream)
+        return stream
+
+    def _stream_frames(self, chunk_size):
+        if self._frame_data is not None:  # Already decoded (and the file closed), only split it up
+            frame_data = self._frame_data
+            for start in range(0, len(frame_data), chunk_size):
+                end = start + chunk_size
+                yield FrameArray(frame_data.time[start:end], frame_data.time_since_previous[start:end],
+                                 frame_data.x[start:end], frame_data.y[start:end], frame_data.keys[start:end])
+            return
+
+        self.check_frames_available()
+        pending = b""
+        carry = np.empty((0, 4))  # Rows held back, the final row is the seed frame
+        started = False
+        time = 0
+
+        for block in iter_decompressed(self.data, chunk_size * 32):
+            block = pending + block
+            cut = block.rfind(b",") + 1
+            pending = block[cut:]
+            rows = np.concatenate((carry, frame_rows(block[:cut])))
+
+            if not started:  # The first two frames are not part of the play, the second holds the offset
+                if len(rows) < 3:
+                    carry = rows
+                    continue
+                time = int(rows[1, 0])
+                rows = rows[2:]
+                started = True
+
+            carry = rows[-1:]
+            rows = rows[:-1]
+
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                deltas = chunk[:, 0].astype(np.int64)
+                times = np.cumsum(deltas) + time
+                time = int(times[-1])
+                yield FrameArray(times, deltas, chunk[:, 1], chunk[:, 2], chunk[:, 3].astype(np.int64))
+
+
+class ParseResult:
+    """
+    Result of parsing one replay with parse_many
+
+    path    -- path of the replay
+    replay  -- ReplayParser, None if parsing failed
+    error   -- exception raised while parsing, None if it succeeded
+    """
+
+    def __init__(self, path, replay=None, error=None):
+        self.path = path
+        self.replay = replay
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def parse_many(paths, jobs: Optional[int] = None, header_only: bool = False, cache: Optional[FrameCache] = None,
+               ordered: bool = True, chunk_size: Optional[int] = None, progress=None):
+    """
+    Parses many replays in a process pool and yields a ParseResult for every path.
+
+    A replay that fails to parse does not stop the batch, its ParseResult holds the error instead.
+
+    paths       -- replay files (.osr)
+    jobs        -- amount of worker processes, defaults to the cpu count (1 parses in this process)
+    header_only -- see ReplayParser
+    cache       -- see ReplayParser
+    ordered     -- yield results in the same order as paths, else as soon as they are done
+    chunk_size  -- amount of replays sent to a worker at once
+    progress    -- called as progress(done, total) every time a chunk is done (Optional)
+    """
+    paths = list(paths)
+    total = len(paths)
+    jobs = jobs or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, min(32, total // (jobs * 4)))
+    chunks = [paths[i:i + chunk_size] for i in range(0, total, chunk_size)]
+
+    done = 0
+    if jobs == 1:
+        for chunk in chunks:
+            results = parse_chunk(chunk, header_only, cache)
+            done += len(results)
+            if progress is not None:
+                progress(done, total)
+            yield from results
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(parse_chunk, chunk, header_only, cache) for chunk in chunks]
+        for future in (futures if ordered else as_completed(futures)):
+            results = future.result()
+            done += len(results)
+            if progress is not None:
+                progress(done, total)
+            yield from results
+
+
+def parse_chunk(paths, header_only: bool = False, cache: Optional[FrameCache] = None):
+    results = []
+    for path in paths:
+        replay = None
+        try:
+            replay = ReplayParser(path, header_only, cache)
+            if not header_only:
+                replay.frame_data
+            results.append(ParseResult(path, replay))
+        except Exception as e:
+            if replay is not None:
+                replay.close()
+            results.append(ParseResult(path, error=e))
+    return results
+
+
+def parse_frames(readable_data: bytes):
+    """
+    Parses the decompressed "w|x|y|z," frame payload into a FrameArray.
+
+    The whole payload is converted to numbers in one pass instead of splitting every frame,
+    the first two frames (skip/offset frames) and the trailing seed frame are dropped,
+    and absolute times are the cumulative sum of the deltas.
+    """
+    trailing_separator = readable_data.endswith(b",")
+    rows = frame_rows(readable_data)
+    offset = int(rows[1, 0])
+    rows = rows[2:len(rows) - (1 if trailing_separator else 2)]
+
+    deltas = rows[:, 0].astype(np.int64)
+    times = np.cumsum(deltas) + offset
+    return FrameArray(times, deltas, rows[:, 1], rows[:, 2], rows[:, 3].astype(np.int64))
+
+
+def frame_rows(readable_data: bytes):
+    """
+    Converts complete "w|x|y|z," frames into a (n, 4) float array
+    """
+    values = np.fromstring(readable_data.replace(b"|", b","), dtype=np.float64, sep=",")
+    if values.size % 4 != 0:
+        raise ValueError("Malformed replay frame data")
+
+    return values.reshape(-1, 4)
+
+
+def iter_decompressed(data, size: int):
+    """
+    Yields the LZMA decompressed data in blocks of at most size bytes
+    """
+    decompressor = LZMADecompressor()
+    position = 0
+    while not decompressor.eof:
+        if decompressor.needs_input:
+            if position >= len(data):
+                break
+            # Copied, a view kept between yields would stop the memory mapped file from being closed
+            block = bytes(data[position:position + size])
+            position += size
+        else:
+            block = b""
+
+        out = decompressor.decompress(block, max_length=size)
+        if out:
+            yield out